@@ -16,18 +16,26 @@ from __future__ import annotations
 
 import argparse
 import csv
+import io
 import os
 import re
 import signal
+import string
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Iterable, Optional
-from urllib.parse import parse_qs, quote_plus, urlparse
+from urllib.parse import quote_plus, unquote_plus
 
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+
+from scraper.rate_limit import TokenBucket
+
 try:
     from dotenv import load_dotenv  # type: ignore
 except Exception:  # pragma: no cover - optional
@@ -55,9 +63,20 @@ except Exception:  # pragma: no cover - optional
         return None
 
 IG_PROFILE_RE = re.compile(r"https?://(?:www\.)?instagram\.com/([A-Za-z0-9._]+)/?", re.I)
+GOOGLE_IG_HREF_RE = re.compile(r"^/url\?.*instagram\.com")
+GOOGLE_Q_RE = re.compile(r"[?&]q=([^&]+)")
+GOOGLE_IG_ANCHORS = SoupStrainer("a", href=GOOGLE_IG_HREF_RE)
 META_PROFILE_TAG = '<meta property="og:type" content="profile"'
+# ASCII-only equivalent of ``quote_plus(term, safe="")`` for str.translate.
+_UNRESERVED = frozenset(string.ascii_letters + string.digits + "_.-~")
+QUERY_ENCODE = {
+    i: chr(i) if chr(i) in _UNRESERVED else "+" if i == 32 else f"%{i:02X}"
+    for i in range(128)
+}
 
 REQUEST_DELAY = 1  # seconds
+MAX_WORKERS = 8
+FLUSH_EVERY = 100  # athletes buffered before writing CSV/Postgres
 
 HEADERS = {
     "User-Agent": (
@@ -67,6 +86,21 @@ HEADERS = {
     )
 }
 
+# Each worker thread gets its own keep-alive session (``requests.Session`` is
+# not thread-safe), so repeat calls to ScrapingBee/BrightData reuse connections.
+_local = threading.local()
+
+# Shared by all worker threads so the overall request rate stays polite.
+LIMITER = TokenBucket(rate=1 / REQUEST_DELAY)
+
+
+def _session() -> requests.Session:
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+        session.headers.update(HEADERS)
+    return session
+
 
 def load_env() -> None:
     """Load environment variables from .env if present."""
@@ -76,7 +110,9 @@ def load_env() -> None:
 
 def build_google_query(first: str, last: str, school: str) -> str:
     term = f'"{first} {last}" "{school}" site:instagram.com -site:instagram.com/p'
-    return quote_plus(term, safe="")  # encode ALL chars
+    if term.isascii():
+        return term.translate(QUERY_ENCODE)
+    return quote_plus(term, safe="")  # encode ALL chars, UTF-8 for non-ASCII
 
 
 @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
@@ -91,10 +127,9 @@ def fetch_scrapingbee(url: str) -> requests.Response:
         "country_code": "us",
         "slow_mode": "1",
     }
-    return requests.get(
+    return _session().get(
         "https://app.scrapingbee.com/api/v1/",
         params=params,
-        headers=HEADERS,
         timeout=30,
     )
 
@@ -107,10 +142,17 @@ def fetch_bright(url: str) -> requests.Response:
         "http": f"http://{key}@zproxy.lum-superproxy.io:22225",
         "https": f"http://{key}@zproxy.lum-superproxy.io:22225",
     }
-    return requests.get(url, proxies=proxy, headers=HEADERS, timeout=30)
+    return _session().get(url, proxies=proxy, timeout=30)
 
 
 def fetch_html(url: str) -> Optional[requests.Response]:
+    """Fetch ``url`` through ScrapingBee, falling back to BrightData.
+
+    A 404 from the target is a definite answer and is returned like a
+    success; ``None`` means no provider produced a usable response.
+    """
+
+    LIMITER.acquire()
     delay = 1
     if os.getenv("SCRAPINGBEE_KEY"):
         for _ in range(2):
@@ -121,7 +163,7 @@ def fetch_html(url: str) -> Optional[requests.Response]:
                     time.sleep(delay)
                     delay *= 2
                     continue
-                if resp.ok:
+                if resp.ok or resp.status_code == 404:
                     return resp
             except Exception as exc:
                 logger.warning("ScrapingBee error: %s", exc)
@@ -129,7 +171,7 @@ def fetch_html(url: str) -> Optional[requests.Response]:
     # BrightData fallback even if ScrapingBee key missing
     try:
         resp = fetch_bright(url)
-        if resp.ok:
+        if resp.ok or resp.status_code == 404:
             return resp
         logger.warning("BrightData returned status %s", resp.status_code)
     except Exception as exc:
@@ -138,12 +180,14 @@ def fetch_html(url: str) -> Optional[requests.Response]:
 
 
 def parse_google_results(html: str) -> list[str]:
-    soup = BeautifulSoup(html, "html.parser")
+    # Only matching anchors are built into the tree; the rest of the SERP is
+    # skipped by the parser.
+    soup = BeautifulSoup(html, "lxml", parse_only=GOOGLE_IG_ANCHORS)
     links = []
-    for a in soup.select("a"):
-        href = a.get("href", "")
-        if href.startswith("/url?"):
-            q = parse_qs(urlparse(href).query).get("q", [""])[0]
+    for a in soup.find_all("a"):
+        m = GOOGLE_Q_RE.search(a["href"])
+        if m:
+            q = unquote_plus(m.group(1))
             if "instagram.com" in q:
                 links.append(q)
         if len(links) >= 5:
@@ -151,9 +195,21 @@ def parse_google_results(html: str) -> list[str]:
     return links
 
 
-def validate_profile(url: str) -> tuple[Optional[str], str, str]:
-    resp = fetch_html(url)
-    if not resp or resp.status_code != 200:
+def _extract_handle(url: str) -> Optional[str]:
+    m = IG_PROFILE_RE.search(url)
+    return m.group(1).lower() if m else None
+
+
+class _FetchFailed(Exception):
+    """No response from any provider; raised so lru_cache does not keep it."""
+
+
+@lru_cache(maxsize=50_000)
+def _validate_handle(handle: str) -> tuple[Optional[str], str, str]:
+    resp = fetch_html(f"https://www.instagram.com/{handle}/")
+    if resp is None:
+        raise _FetchFailed(handle)
+    if resp.status_code != 200:
         return None, "NOT_FOUND", ""
     html_low = resp.text.lower()
     if 'property="og:type"' not in html_low or 'content="profile"' not in html_low:
@@ -167,6 +223,19 @@ def validate_profile(url: str) -> tuple[Optional[str], str, str]:
     return handle, status, canonical
 
 
+def validate_profile(url: str) -> tuple[Optional[str], str, str]:
+    # Google often returns several links to the same profile, and teammates
+    # share tagged accounts, so results are cached per handle.
+    handle = _extract_handle(url)
+    if not handle:
+        return None, "NOT_FOUND", ""
+    try:
+        return _validate_handle(handle)
+    except _FetchFailed:
+        # Transient provider failure: report it but let a later link retry.
+        return None, "NOT_FOUND", ""
+
+
 @dataclass
 class Athlete:
     athlete_id: int
@@ -188,11 +257,11 @@ def sigint_handler(signum, frame):
     raise GracefulExit()
 
 
-def processed_ids(out_file: Path) -> set[int]:
+def processed_ids(out_file: Path) -> frozenset[int]:
     if not out_file.exists():
-        return set()
-    df = pd.read_csv(out_file)
-    return set(df["athlete_id"].astype(int))
+        return frozenset()
+    df = pd.read_csv(out_file, usecols=["athlete_id"], dtype={"athlete_id": "int64"})
+    return frozenset(df["athlete_id"].to_numpy().tolist())
 
 
 def write_results(out_file: Path, rows: Iterable[Athlete]):
@@ -229,23 +298,51 @@ def upsert_postgres(rows: Iterable[Athlete], dsn: str):
         )
         """
     )
-    for r in rows:
-        cur.execute(
-            """
-            INSERT INTO nil_athletes (athlete_id, instagram_handle, profile_url, status)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (athlete_id) DO UPDATE
-                SET instagram_handle = EXCLUDED.instagram_handle,
-                    profile_url = EXCLUDED.profile_url,
-                    status = EXCLUDED.status
-            """,
-            (r.athlete_id, r.instagram_handle, r.profile_url, r.status),
-        )
+    # Last row wins for duplicate ids; a set-based upsert cannot touch a row twice.
+    latest = {r.athlete_id: r for r in rows}
+    # QUOTE_ALL keeps empty strings as '' rather than COPY's unquoted NULL.
+    buf = io.StringIO()
+    csv.writer(buf, quoting=csv.QUOTE_ALL).writerows(
+        (r.athlete_id, r.instagram_handle, r.profile_url, r.status)
+        for r in latest.values()
+    )
+    buf.seek(0)
+    cur.execute("CREATE TEMP TABLE tmp_nil_athletes (LIKE nil_athletes) ON COMMIT DROP")
+    cur.copy_expert(
+        "COPY tmp_nil_athletes (athlete_id, instagram_handle, profile_url, status) "
+        "FROM STDIN WITH (FORMAT csv)",
+        buf,
+    )
+    cur.execute(
+        """
+        INSERT INTO nil_athletes (athlete_id, instagram_handle, profile_url, status)
+        SELECT athlete_id, instagram_handle, profile_url, status FROM tmp_nil_athletes
+        ON CONFLICT (athlete_id) DO UPDATE
+            SET instagram_handle = EXCLUDED.instagram_handle,
+                profile_url = EXCLUDED.profile_url,
+                status = EXCLUDED.status
+        """
+    )
     conn.commit()
     cur.close()
     conn.close()
 
 
+def flush_results(
+    out_file: Path, rows: list[Athlete], dsn: Optional[str] = None
+) -> None:
+    """Write buffered ``rows`` to CSV (and Postgres) and empty the buffer."""
+    if not rows:
+        return
+    write_results(out_file, rows)
+    # Empty the buffer once the CSV has the rows, so a failed upsert cannot
+    # make a later flush append them again.
+    batch = rows.copy()
+    rows.clear()
+    if dsn:
+        upsert_postgres(batch, dsn)
+
+
 def process_row(row) -> Athlete:
     athlete = Athlete(
         athlete_id=int(row["athlete_id"]),
@@ -270,7 +367,6 @@ def process_row(row) -> Athlete:
     links = parse_google_results(resp.text)
     for link in links:
         handle, status, canonical = validate_profile(link)
-        time.sleep(REQUEST_DELAY)
         if handle:
             athlete.instagram_handle = handle
             athlete.profile_url = canonical
@@ -287,6 +383,9 @@ def main(args=None):
     parser.add_argument("--out", dest="output", required=True, help="Output CSV")
     parser.add_argument("--mode", default="enrich", choices=["enrich"], help="Mode")
     parser.add_argument("--dsn", help="Postgres DSN for optional upsert")
+    parser.add_argument(
+        "--workers", type=int, default=MAX_WORKERS, help="Concurrent athlete lookups"
+    )
     opts = parser.parse_args(args)
 
     load_env()
@@ -299,17 +398,37 @@ def main(args=None):
 
     signal.signal(signal.SIGINT, sigint_handler)
 
+    executor = ThreadPoolExecutor(max_workers=opts.workers)
+    pending: list[Athlete] = []
+    futures = []
+    consumed = set()
     try:
-        for _, row in df.iterrows():
-            if int(row["athlete_id"]) in done:
-                continue
-            athlete = process_row(row)
-            write_results(output_path, [athlete])
-            if opts.dsn:
-                upsert_postgres([athlete], opts.dsn)
-            time.sleep(REQUEST_DELAY)
+        # Plain dicts keep process_row's row["..."]/row.get() access without
+        # building a pandas Series per athlete as iterrows() does.
+        for row in df.to_dict("records"):
+            if int(row["athlete_id"]) not in done:
+                futures.append(executor.submit(process_row, row))
+        # Results are written from this thread only, so no lock is needed.
+        for fut in as_completed(futures):
+            consumed.add(fut)
+            pending.append(fut.result())
+            if len(pending) >= FLUSH_EVERY:
+                flush_results(output_path, pending, opts.dsn)
     except GracefulExit:
         logger.info("Interrupted, exiting gracefully.")
+    finally:
+        executor.shutdown(cancel_futures=True)
+        # Lookups still running at interrupt finish during shutdown; keep
+        # their (paid) results instead of repeating them on resume.
+        pending.extend(
+            fut.result()
+            for fut in futures
+            if fut.done()
+            and not fut.cancelled()
+            and fut not in consumed
+            and fut.exception() is None
+        )
+        flush_results(output_path, pending, opts.dsn)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+"""Rate limiting shared by the roster and Instagram scrapers."""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at ``rate`` tokens per second."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        # ``_updated`` lies in the future while a penalty is in force.
+        if now > self._updated:
+            refill = (now - self._updated) * self.rate
+            self._tokens = min(self.capacity, self._tokens + refill)
+            self._updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Block until a token is available, then take it.
+
+        Returns ``False`` if no token became available within ``timeout``
+        seconds.
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = max(self._updated - now, 0.0) + (1 - self._tokens) / self.rate
+                if deadline is not None:
+                    if now >= deadline:
+                        return False
+                    wait = min(wait, deadline - now)
+                self._cond.wait(wait)
+
+    def penalize(self, seconds: float) -> None:
+        """Empty the bucket and stop refilling it for ``seconds``."""
+
+        with self._cond:
+            self._tokens = 0.0
+            self._updated = max(self._updated, time.monotonic() + seconds)
+            self._cond.notify_all()
@@ -1,10 +1,13 @@
-"""Selenium-based roster scraper for Sports-Reference.
+"""Roster scraper for Sports-Reference.
 
 This script downloads roster data for men's basketball, women's
-basketball and FBS football teams from 2016-2021 using Selenium
-WebDriver. It attempts to bypass rate limiting by allowing proxy
-rotation and adds delays between requests. Results are appended to
-``data/selenium_rosters.csv`` so the process can be resumed.
+basketball and FBS football teams from 2016-2021. The ``?output=csv``
+endpoints need no JavaScript, so rosters are fetched with a keep-alive
+``requests`` session rather than a browser. One worker thread runs per
+proxy and stays on that proxy for the whole run; each worker is throttled
+by its own token bucket and backs off when its proxy is rate limited.
+Results are appended to ``data/selenium_rosters.csv`` so the process can
+be resumed.
 
 Team CSV files must be placed in the working directory with the
 following names:
@@ -18,15 +21,20 @@ The files should contain ``school_slug``, ``school_name`` and
 from __future__ import annotations
 
 import io
-import time
+import json
+import queue
+import random
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import IO, Iterable, Optional
 
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.common.exceptions import WebDriverException
+import requests
+from requests.adapters import HTTPAdapter
+
+from scraper.rate_limit import TokenBucket
 
 
 TEAM_FILES = {
@@ -34,28 +42,129 @@ TEAM_FILES = {
     "women": Path("356.csv"),
     "football": Path("130.csv"),
 }
+TEAM_COLUMNS = ["school_slug", "school_name", "conference"]
+# Rosters that returned 404 (no team that season); skipped on later runs.
+MISSING_FILE = Path("data/missing_rosters.csv")
+# Append-only log of rosters written to the output, one JSON object per line,
+# so resuming does not have to re-read the whole output CSV.
+COMPLETED_FILE = Path("data/completed.jsonl")
+
+MAX_TRIES = 5
+FLUSH_EVERY = 20  # rosters per CSV write
+FLUSH_INTERVAL = 30.0  # seconds idle before a partial batch is written
+BACKOFF_CAP = 60.0  # seconds
+STOP_POLL = 0.5  # seconds between stop checks while waiting on the bucket
+
+# Roster fields with known types; columns a sport lacks are ignored by
+# ``read_csv``. Numeric fields are left to inference because Sports-Reference
+# leaves them blank or free-form for some players.
+ROSTER_DTYPES = {
+    "Player": "string",
+    "Class": "category",
+    "Pos": "category",
+}
+
+# Output header: the union of the roster fields of all three sports followed
+# by the team metadata added in ``scrape_roster``. Declared up front so the
+# header does not depend on which sport happens to be flushed first.
+ROSTER_COLUMNS = [
+    "Player",
+    "#",
+    "Class",
+    "Pos",
+    "Height",
+    "Weight",
+    "Hometown",
+    "High School",
+    "RSCI Top 100",
+    "Summary",
+    "season",
+    "sport",
+    "school_slug",
+    "school_name",
+    "conference",
+]
+
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/125.0.0.0 Safari/537.36"
+    )
+}
+
+# Each worker thread owns one proxy, its rate limiter and one keep-alive
+# session (``requests.Session`` is not thread-safe).
+_local = threading.local()
+
+
+class RateLimited(RuntimeError):
+    """Raised on HTTP 429; ``retry_after`` is the server's hint in seconds."""
+
+    def __init__(self, retry_after: Optional[float] = None):
+        super().__init__("429")
+        self.retry_after = retry_after
+
+
+class RosterMissing(Exception):
+    """Raised when Sports-Reference has no roster for a team and season."""
+
+
+class NotCSV(ValueError):
+    """Raised when a 200 response is an HTML page (challenge, redirect) or empty."""
 
 
-def build_driver(proxy: Optional[str] = None, *, headless: bool = True) -> webdriver.Chrome:
-    """Create and return a Chrome WebDriver instance."""
+def _new_session() -> requests.Session:
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    # Retries are handled by ``scrape_roster``.
+    session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=0))
+    return session
 
-    options = Options()
-    if headless:
-        options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    if proxy:
-        options.add_argument(f"--proxy-server={proxy}")
-    return webdriver.Chrome(options=options)
 
+def _init_worker(proxy_pool: queue.SimpleQueue, delay: float) -> None:
+    """Bind the calling worker thread to the next free proxy."""
 
-def parse_roster(csv_text: str) -> pd.DataFrame:
-    """Parse CSV text returned by Sports-Reference."""
+    _local.proxy = proxy_pool.get()
+    _local.bucket = TokenBucket(rate=1 / delay)
+    _local.session = _new_session()
 
-    return pd.read_csv(io.StringIO(csv_text))
 
+def _session() -> requests.Session:
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = _new_session()
+    return session
 
-def fetch_roster(driver: webdriver.Chrome, sport: str, slug: str, year: int) -> pd.DataFrame:
+
+def parse_roster(csv_bytes: bytes) -> pd.DataFrame:
+    """Parse raw CSV bytes returned by Sports-Reference."""
+
+    head = csv_bytes.lstrip(b"\xef\xbb\xbf \t\r\n")[:1]
+    if not head or head == b"<":
+        raise NotCSV("response body is empty or HTML")
+    return pd.read_csv(
+        io.BytesIO(csv_bytes), engine="c", dtype=ROSTER_DTYPES, low_memory=False
+    )
+
+
+def _retry_after(resp: requests.Response) -> Optional[float]:
+    try:
+        return float(resp.headers.get("Retry-After", ""))
+    except ValueError:  # missing or an HTTP-date
+        return None
+
+
+def _backoff(tries: int, base: float, retry_after: Optional[float] = None) -> float:
+    """Capped exponential backoff with full jitter, at least ``retry_after``."""
+
+    wait = random.uniform(0, min(BACKOFF_CAP, base * 2**tries))
+    return wait if retry_after is None else max(wait, retry_after)
+
+
+def fetch_roster(
+    sport: str, slug: str, year: int, proxy: Optional[str] = None
+) -> pd.DataFrame:
     """Download roster CSV for ``slug`` and return a DataFrame."""
 
     if sport == "men":
@@ -65,19 +174,213 @@ def fetch_roster(driver: webdriver.Chrome, sport: str, slug: str, year: int) ->
     else:
         url = f"https://www.sports-reference.com/cfb/schools/{slug}/{year}-roster.html?output=csv"
 
-    driver.get(url)
-    if "Too Many Requests" in driver.page_source:
-        raise RuntimeError("429")
-    pre = driver.find_element(By.TAG_NAME, "pre")
-    return parse_roster(pre.text)
+    proxies = {"http": proxy, "https": proxy} if proxy else None
+    resp = _session().get(url, timeout=30, proxies=proxies)
+    if resp.status_code == 429:
+        raise RateLimited(_retry_after(resp))
+    if resp.status_code == 404:
+        raise RosterMissing(url)
+    resp.raise_for_status()
+    return parse_roster(resp.content)
+
+
+def append_frames(
+    frames: list[pd.DataFrame], fh: IO[str], columns: list[str]
+) -> None:
+    """Append list of frames to the open CSV handle ``fh``.
+
+    Frames sharing a column layout are concatenated and written together;
+    layouts are never unioned. Each batch is aligned to the header
+    ``columns`` so rosters with different fields cannot shift columns;
+    fields a sport lacks are left blank. Fields missing from the header
+    are dropped with a warning.
+    """
+
+    groups: dict[tuple, list[pd.DataFrame]] = {}
+    for df in frames:
+        groups.setdefault(tuple(df.columns), []).append(df)
+    for layout, group in groups.items():
+        dropped = [col for col in layout if col not in columns]
+        if dropped:
+            warnings.warn(f"columns not in output header dropped: {dropped}")
+        batch = group[0] if len(group) == 1 else pd.concat(group, ignore_index=True)
+        batch.reindex(columns=columns).to_csv(fh, index=False, header=False)
 
 
-def append_frames(frames: list[pd.DataFrame], output: Path) -> None:
-    """Append list of frames to ``output`` CSV."""
+def _load_missing(path: Path) -> set[tuple[str, int, str]]:
+    if not path.exists():
+        return set()
+    df = pd.read_csv(path)
+    return set(zip(df["sport"], df["season"].astype(int).tolist(), df["school_slug"]))
 
-    df = pd.concat(frames, ignore_index=True)
-    header = not output.exists()
-    df.to_csv(output, mode="a", index=False, header=header)
+
+def _save_missing(path: Path, missing: set[tuple[str, int, str]]) -> None:
+    pd.DataFrame(sorted(missing), columns=["sport", "season", "school_slug"]).to_csv(
+        path, index=False
+    )
+
+
+def _log_completed(fh: IO[str], keys: Iterable[tuple[str, int, str]]) -> None:
+    fh.writelines(
+        json.dumps({"sport": sport, "season": int(year), "school_slug": slug}) + "\n"
+        for sport, year, slug in keys
+    )
+    fh.flush()
+
+
+def _completed_keys(output: Path) -> list[tuple[str, int, str]]:
+    """Return ``(sport, season, slug)`` keys already written to ``output``.
+
+    Keys are read from ``COMPLETED_FILE``. Without it (output from older
+    runs) the output CSV is scanned once and the sidecar rebuilt from it.
+    """
+
+    if not output.exists() or not output.stat().st_size:
+        COMPLETED_FILE.unlink(missing_ok=True)
+        return []
+    if COMPLETED_FILE.exists():
+        with COMPLETED_FILE.open() as f:
+            # A line without a newline was cut off mid-write; its roster
+            # is fetched again.
+            entries = [json.loads(line) for line in f if line.endswith("\n")]
+        return [(e["sport"], e["season"], e["school_slug"]) for e in entries]
+    done = pd.read_csv(output, usecols=["sport", "season", "school_slug"]).drop_duplicates()
+    seasons = done["season"].astype(int).tolist()
+    keys = list(zip(done["sport"], seasons, done["school_slug"]))
+    with COMPLETED_FILE.open("w") as f:
+        _log_completed(f, keys)
+    return keys
+
+
+def _key(sport: str, year: int, slug: str) -> int:
+    """Compact resume key for a roster; ``hash`` is stable within a run."""
+
+    return hash((sport, int(year), slug))
+
+
+def scrape_roster(
+    sport: str,
+    slug: str,
+    school: str,
+    conf: str,
+    year: int,
+    delay: float,
+    stop: threading.Event,
+) -> Optional[pd.DataFrame]:
+    """Fetch one roster on this worker's proxy and tag it with team metadata.
+
+    Returns ``None`` if every attempt fails or ``stop`` is set. Bodies that
+    are not a roster CSV are retried like network errors; ``RosterMissing``
+    is not retried.
+    """
+
+    proxy = _local.proxy
+    bucket = _local.bucket
+    tries = 0
+    while tries < MAX_TRIES and not stop.is_set():
+        # Poll so a shutdown is not held up by a long backoff penalty.
+        if not bucket.acquire(timeout=STOP_POLL):
+            continue
+        try:
+            return fetch_roster(sport, slug, year, proxy).assign(
+                season=year,
+                sport=sport,
+                school_slug=slug,
+                school_name=school,
+                conference=conf,
+            )
+        except RateLimited as exc:
+            tries += 1
+            # Only this worker's proxy is throttled; others keep going.
+            bucket.penalize(_backoff(tries, delay, exc.retry_after))
+        except (
+            requests.RequestException,
+            NotCSV,
+            pd.errors.ParserError,
+            pd.errors.EmptyDataError,
+        ):
+            tries += 1
+            bucket.penalize(_backoff(tries, delay))
+    return None
+
+
+def _produce(
+    results: queue.Queue, item: tuple, delay: float, stop: threading.Event
+) -> None:
+    """Worker task: scrape ``item`` and hand the outcome to the writer."""
+
+    try:
+        df = scrape_roster(*item, delay, stop)
+    except RosterMissing:
+        results.put((item, None))
+        return
+    if df is not None:
+        results.put((item, df))
+
+
+_IDLE = object()
+
+
+class RosterWriter(threading.Thread):
+    """Single consumer that appends scraped rosters to the output CSV.
+
+    Workers put ``(item, df)`` pairs on ``queue``; ``df`` is ``None`` for a
+    missing roster. A ``None`` message stops the thread after a final
+    flush. Frames are written every ``FLUSH_EVERY`` rosters, or sooner once
+    the queue has been idle for ``FLUSH_INTERVAL`` seconds. Their keys are
+    logged to ``done_fh`` only after the rows themselves are flushed.
+    """
+
+    def __init__(
+        self,
+        fh: IO[str],
+        done_fh: IO[str],
+        columns: list[str],
+        known_missing: set[tuple[str, int, str]],
+    ):
+        super().__init__(name="roster-writer", daemon=True)
+        self.queue: queue.Queue = queue.Queue(maxsize=64)
+        self.fh = fh
+        self.done_fh = done_fh
+        self.columns = columns
+        self.known_missing = known_missing
+        self.error: Optional[Exception] = None
+
+    def run(self) -> None:
+        frames: list[pd.DataFrame] = []
+        keys: list[tuple[str, int, str]] = []
+        while True:
+            try:
+                msg = self.queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                msg = _IDLE
+            if msg is None:
+                break
+            if msg is not _IDLE:
+                (sport, slug, _school, _conf, year), df = msg
+                if df is None:
+                    self.known_missing.add((sport, year, slug))
+                    continue
+                frames.append(df)
+                keys.append((sport, year, slug))
+                if len(frames) < FLUSH_EVERY:
+                    continue
+            self._flush(frames, keys)
+        self._flush(frames, keys)
+
+    def _flush(
+        self, frames: list[pd.DataFrame], keys: list[tuple[str, int, str]]
+    ) -> None:
+        if frames and self.error is None:
+            try:
+                append_frames(frames, self.fh, self.columns)
+                self.fh.flush()
+                _log_completed(self.done_fh, keys)
+            except Exception as exc:
+                # Keep draining so producers never block on a full queue.
+                self.error = exc
+        frames.clear()
+        keys.clear()
 
 
 def main(
@@ -85,64 +388,80 @@ def main(
     delay: float = 3.0,
     proxies: Optional[list[str]] = None,
 ) -> None:
-    """Scrape rosters using Selenium."""
+    """Scrape rosters for every team and season in ``TEAM_FILES``.
 
+    One worker thread runs per proxy, each limited by its own token bucket
+    to one request every ``delay`` seconds.
+    """
+
+    if delay <= 0:
+        raise ValueError("delay must be positive")
     if proxies is None:
         proxies = [None]
-    proxy_idx = 0
 
     output = Path("data/selenium_rosters.csv")
     output.parent.mkdir(parents=True, exist_ok=True)
 
-    if output.exists():
-        done = pd.read_csv(output, usecols=["sport", "season", "school_slug"])
-        completed = {
-            (r.sport, int(r.season), r.school_slug) for r in done.itertuples(index=False)
-        }
+    completed = {_key(*k) for k in _completed_keys(output)}
+    known_missing = _load_missing(MISSING_FILE)
+    completed |= {_key(*k) for k in known_missing}
+
+    seasons = list(seasons)
+    work = []
+    for sport, csv_file in TEAM_FILES.items():
+        teams = pd.read_csv(csv_file)
+        missing = set(TEAM_COLUMNS) - set(teams.columns)
+        if missing:
+            raise ValueError(f"{csv_file} is missing columns: {sorted(missing)}")
+        # Parallel column lists, built once and reused for every season.
+        slugs, schools, confs = (teams[col].tolist() for col in TEAM_COLUMNS)
+        for year in seasons:
+            for slug, school, conf in zip(slugs, schools, confs):
+                if _key(sport, year, slug) not in completed:
+                    work.append((sport, slug, school, conf, year))
+
+    proxy_pool: queue.SimpleQueue = queue.SimpleQueue()
+    for proxy in proxies:
+        proxy_pool.put(proxy)
+    executor = ThreadPoolExecutor(
+        max_workers=len(proxies), initializer=_init_worker, initargs=(proxy_pool, delay)
+    )
+    # One buffered handle for the whole run instead of reopening per flush.
+    fh = output.open("a", buffering=1 << 20, newline="")
+    done_fh = COMPLETED_FILE.open("a", buffering=1 << 16)
+    # Resumed files keep the header they were started with.
+    columns = ROSTER_COLUMNS
+    if output.stat().st_size:
+        columns = list(pd.read_csv(output, nrows=0).columns)
     else:
-        completed = set()
+        pd.DataFrame(columns=columns).to_csv(fh, index=False)
 
-    driver = build_driver(proxies[proxy_idx])
-    frames: list[pd.DataFrame] = []
+    # Workers only fetch; the writer thread owns the output file and
+    # ``known_missing`` until it is joined.
+    writer = RosterWriter(fh, done_fh, columns, known_missing)
+    writer.start()
+    # Set on the way out (e.g. Ctrl-C) so running tasks stop retrying.
+    stop = threading.Event()
 
     try:
-        for sport, csv_file in TEAM_FILES.items():
-            teams = pd.read_csv(csv_file)
-            for year in seasons:
-                for slug, school, conf in teams.itertuples(index=False):
-                    key = (sport, year, slug)
-                    if key in completed:
-                        continue
-                    tries = 0
-                    while tries < 3:
-                        try:
-                            df = fetch_roster(driver, sport, slug, year)
-                            df["season"] = year
-                            df["sport"] = sport
-                            df["school_slug"] = slug
-                            df["school_name"] = school
-                            df["conference"] = conf
-                            frames.append(df)
-                            if len(frames) >= 20:
-                                append_frames(frames, output)
-                                frames = []
-                            break
-                        except RuntimeError:
-                            tries += 1
-                            driver.quit()
-                            proxy_idx = (proxy_idx + 1) % len(proxies)
-                            driver = build_driver(proxies[proxy_idx])
-                            time.sleep(delay * tries)
-                        except WebDriverException:
-                            tries += 1
-                            driver.quit()
-                            driver = build_driver(proxies[proxy_idx])
-                            time.sleep(delay * tries)
-                    time.sleep(delay)
+        futures = [
+            executor.submit(_produce, writer.queue, item, delay, stop) for item in work
+        ]
+        for fut in as_completed(futures):
+            fut.result()
+            if writer.error:
+                raise writer.error
     finally:
-        if frames:
-            append_frames(frames, output)
-        driver.quit()
+        stop.set()
+        executor.shutdown(cancel_futures=True)
+        writer.queue.put(None)
+        writer.join()
+        fh.close()
+        done_fh.close()
+        if known_missing:
+            _save_missing(MISSING_FILE, known_missing)
+    if writer.error:
+        raise writer.error
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+"""
+Offline tests for ig_scraper.py helpers
+
+test_smoke.py monkey-patches the shared ``ig_scraper`` module at import
+time, so these tests load a private copy of it instead.
+"""
+from pathlib import Path
+import importlib.util
+import sys
+import types
+from urllib.parse import quote_plus
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from scraper.rate_limit import TokenBucket
+
+_spec = importlib.util.spec_from_file_location("ig_scraper_under_test", ROOT / "ig_scraper.py")
+ig = importlib.util.module_from_spec(_spec)
+sys.modules[_spec.name] = ig  # dataclasses look the module up by name
+_spec.loader.exec_module(ig)
+
+
+def test_google_query_matches_quote_plus():
+    cases = [
+        ("John", "Doe", "Duke"),
+        ("D'Andre", "O'Neil-Smith", "Texas A&M"),
+        ("Jo", "Ann", "St. John's (NY) 100% #1 / ~x+y=z?"),
+        ("José", "Núñez", "Saint Mary's"),
+    ]
+    for first, last, school in cases:
+        term = f'"{first} {last}" "{school}" site:instagram.com -site:instagram.com/p'
+        assert ig.build_google_query(first, last, school) == quote_plus(term, safe="")
+    ascii_chars = "".join(map(chr, range(128)))
+    assert ascii_chars.translate(ig.QUERY_ENCODE) == quote_plus(ascii_chars, safe="")
+
+
+SERP_HTML = """
+<html><body>
+<a href="/search?q=jane+doe+instagram.com&amp;tbm=isch">Images</a>
+<a href="/url?q=https://www.instagram.com/jane.doe/&amp;sa=U&amp;ved=2ah">Jane</a>
+<a href="/url?q=https%3A%2F%2Fwww.instagram.com%2Fj%C3%B6rg_s%2F&amp;sa=U">Jorg</a>
+<a href="/url?sa=U&amp;q=https://instagram.com/second_param/&amp;ved=x">Second</a>
+<a href="/url?q=https://example.com/roster&amp;ref=instagram.com">Roster</a>
+<a href="/url?q=https://www.instagram.com/fourth/&amp;sa=U">4</a>
+<a href="/url?q=https://www.instagram.com/fifth/&amp;sa=U">5</a>
+<a href="/url?q=https://www.instagram.com/sixth/&amp;sa=U">6</a>
+</body></html>
+"""
+
+
+def test_parse_google_results():
+    assert ig.parse_google_results(SERP_HTML) == [
+        "https://www.instagram.com/jane.doe/",
+        "https://www.instagram.com/jörg_s/",
+        "https://instagram.com/second_param/",
+        "https://www.instagram.com/fourth/",
+        "https://www.instagram.com/fifth/",
+    ]
+
+
+def fake_bright(status_code: int, calls: list[str]):
+    def fetch(url):
+        calls.append(url)
+        return types.SimpleNamespace(
+            ok=status_code < 400, status_code=status_code, text="", url=url
+        )
+
+    return fetch
+
+
+def use_bright(monkeypatch, status_code: int) -> list[str]:
+    calls: list[str] = []
+    monkeypatch.delenv("SCRAPINGBEE_KEY", raising=False)
+    monkeypatch.setattr(ig, "LIMITER", TokenBucket(rate=1000))
+    monkeypatch.setattr(ig, "fetch_bright", fake_bright(status_code, calls))
+    ig._validate_handle.cache_clear()
+    return calls
+
+
+def test_dead_handle_fetched_once(monkeypatch):
+    calls = use_bright(monkeypatch, 404)
+
+    for _ in range(3):
+        assert ig.validate_profile("https://www.instagram.com/gone.handle/") == (
+            None,
+            "NOT_FOUND",
+            "",
+        )
+    assert len(calls) == 1
+
+
+def test_provider_failure_not_cached(monkeypatch):
+    calls = use_bright(monkeypatch, 502)
+
+    for _ in range(2):
+        assert ig.validate_profile("https://www.instagram.com/some.handle/")[1] == "NOT_FOUND"
+    assert len(calls) == 2
@@ -0,0 +1,156 @@
+"""
+Offline tests for selenium_scraper.py
+
+``_session`` is replaced with a fake so rosters are served from memory
+instead of Sports-Reference.
+"""
+from pathlib import Path
+import json
+import queue
+import sys
+import threading
+import time
+import types
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pandas as pd
+import requests
+
+import selenium_scraper
+
+BASKETBALL_CSV = b"Player,Pos,Class\nJohn Doe,G,FR\nJim Roe,F,SO\n"
+FOOTBALL_CSV = b'Player,Class,Pos,Hometown\nJack Smith,SR,QB,"Tuscaloosa, AL"\n'
+CHALLENGE_HTML = b"<!DOCTYPE html>\n<html><body>Just a moment...</body></html>\n"
+
+
+class FakeResponse(types.SimpleNamespace):
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code))
+
+
+class FakeSession:
+    """Serve canned responses per school slug, recording every URL."""
+
+    def __init__(self):
+        self.calls: list[str] = []
+        self.throttled: set[str] = set()
+
+    def get(self, url, **kwargs):
+        self.calls.append(url)
+        slug = url.split("/schools/")[1].split("/")[0]
+        if slug == "gone":
+            return FakeResponse(status_code=404, headers={}, content=b"")
+        if slug == "busy" and slug not in self.throttled:
+            self.throttled.add(slug)
+            return FakeResponse(status_code=429, headers={"Retry-After": "0"}, content=b"")
+        if slug == "challenged" and slug not in self.throttled:
+            self.throttled.add(slug)
+            return FakeResponse(status_code=200, headers={}, content=CHALLENGE_HTML)
+        body = FOOTBALL_CSV if "/cfb/" in url else BASKETBALL_CSV
+        return FakeResponse(status_code=200, headers={}, content=body)
+
+    def slugs(self) -> list[str]:
+        return [url.split("/schools/")[1].split("/")[0] for url in self.calls]
+
+
+def write_teams(path: Path, slugs: list[str]) -> None:
+    pd.DataFrame(
+        {
+            "school_slug": slugs,
+            "school_name": [s.title() for s in slugs],
+            "conference": "Test",
+        }
+    ).to_csv(path, index=False)
+
+
+def run(tmp_path, monkeypatch, men: list[str]) -> FakeSession:
+    write_teams(tmp_path / "men.csv", men)
+    write_teams(tmp_path / "football.csv", ["alabama"])
+    session = FakeSession()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(
+        selenium_scraper,
+        "TEAM_FILES",
+        {"men": tmp_path / "men.csv", "football": tmp_path / "football.csv"},
+    )
+    monkeypatch.setattr(selenium_scraper, "_session", lambda: session)
+    selenium_scraper.main(seasons=[2019], delay=0.01)
+    return session
+
+
+def test_429_retried_and_404_recorded(tmp_path, monkeypatch):
+    session = run(tmp_path, monkeypatch, ["duke", "busy", "gone"])
+
+    assert session.slugs().count("busy") == 2
+    assert session.slugs().count("gone") == 1
+
+    df = pd.read_csv(tmp_path / "data" / "selenium_rosters.csv")
+    assert set(df["school_slug"]) == {"duke", "busy", "alabama"}
+
+    missing = pd.read_csv(tmp_path / "data" / "missing_rosters.csv")
+    assert missing.to_dict("records") == [
+        {"sport": "men", "season": 2019, "school_slug": "gone"}
+    ]
+
+
+def test_html_body_retried_not_written(tmp_path, monkeypatch):
+    session = run(tmp_path, monkeypatch, ["challenged", "duke"])
+
+    assert session.slugs().count("challenged") == 2
+    df = pd.read_csv(tmp_path / "data" / "selenium_rosters.csv")
+    assert "Player" in df.columns
+    assert not any("html" in col.lower() for col in df.columns)
+    assert set(df["school_slug"]) == {"challenged", "duke", "alabama"}
+
+
+def test_columns_aligned_to_header(tmp_path, monkeypatch):
+    run(tmp_path, monkeypatch, ["duke"])
+
+    df = pd.read_csv(tmp_path / "data" / "selenium_rosters.csv")
+    football = df[df["sport"] == "football"]
+    assert football["Player"].tolist() == ["Jack Smith"]
+    assert football["Pos"].tolist() == ["QB"]
+    assert football["Class"].tolist() == ["SR"]
+    assert football["school_slug"].tolist() == ["alabama"]
+    assert football["Hometown"].tolist() == ["Tuscaloosa, AL"]
+    men = df[df["sport"] == "men"]
+    assert men["Pos"].tolist() == ["G", "F"]
+    assert men["Hometown"].isna().all()
+    assert list(df.columns) == selenium_scraper.ROSTER_COLUMNS
+
+
+def test_rerun_fetches_only_new_keys(tmp_path, monkeypatch):
+    run(tmp_path, monkeypatch, ["duke"])
+    completed = tmp_path / "data" / "completed.jsonl"
+    keys = {tuple(json.loads(line).values()) for line in completed.read_text().splitlines()}
+    assert keys == {("men", 2019, "duke"), ("football", 2019, "alabama")}
+
+    # A key present only in the sidecar must be skipped too.
+    with completed.open("a") as f:
+        f.write(json.dumps({"sport": "men", "season": 2019, "school_slug": "uconn"}) + "\n")
+
+    session = run(tmp_path, monkeypatch, ["duke", "uconn", "ucla"])
+
+    assert session.slugs() == ["ucla"]
+    df = pd.read_csv(tmp_path / "data" / "selenium_rosters.csv")
+    assert sorted(df["school_slug"].unique()) == ["alabama", "duke", "ucla"]
+
+
+def test_stop_interrupts_backoff(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(selenium_scraper, "_session", lambda: session)
+    pool = queue.SimpleQueue()
+    pool.put(None)
+    selenium_scraper._init_worker(pool, 0.01)
+    selenium_scraper._local.bucket.penalize(60)
+    stop = threading.Event()
+    threading.Timer(0.1, stop.set).start()
+
+    start = time.monotonic()
+    df = selenium_scraper.scrape_roster("men", "duke", "Duke", "ACC", 2019, 0.01, stop)
+
+    assert df is None
+    assert time.monotonic() - start < 5
+    assert session.calls == []